@@ -54,13 +54,4 @@ from .exceptions import (
 # Set default logging handler to avoid "No handler found" warnings.
 import logging
 
-try:  # Python 2.7+
-    from logging import NullHandler  # pylint: disable=no-name-in-module
-except ImportError:  # pragma: no cover
-
-    class NullHandler(logging.Handler):
-        def emit(self, record):
-            pass
-
-
-logging.getLogger(__name__).addHandler(NullHandler())
+logging.getLogger(__name__).addHandler(logging.NullHandler())
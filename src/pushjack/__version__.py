@@ -1,11 +1,19 @@
 # -*- coding: utf-8 -*-
 """Project version information."""
 
-from pkg_resources import get_distribution, DistributionNotFound
+try:
+    from importlib.metadata import PackageNotFoundError, version
+except ImportError:  # pragma: no cover
+    # Python < 3.8. Importing pkg_resources is slow so only use it as a fallback.
+    from pkg_resources import DistributionNotFound as PackageNotFoundError
+    from pkg_resources import get_distribution
+
+    def version(distribution_name):
+        return get_distribution(distribution_name).version
 
 
 try:
-    __version__ = get_distribution(__name__.split(".")[0]).version
-except DistributionNotFound:  # pragma: no cover
+    __version__ = version(__name__.split(".")[0])
+except PackageNotFoundError:  # pragma: no cover
     # Package is not installed.
     __version__ = None
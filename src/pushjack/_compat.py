@@ -63,3 +63,13 @@ else:
         cls.__unicode__ = cls.__str__
         cls.__str__ = lambda x: x.__unicode__().encode("utf-8")
         return cls
+
+
+try:
+    # Python 3.5+
+    bytearray_hex = bytearray.hex
+except AttributeError:
+    from binascii import hexlify
+
+    def bytearray_hex(data):
+        return hexlify(data).decode("ascii")
@@ -21,15 +21,26 @@ For more details regarding Apple's APNS documentation, consult the following:
 - `Provider Communication with APNS <http://goo.gl/qMfByr>`_
 """
 
-from binascii import hexlify, unhexlify
+from binascii import unhexlify
 from collections import namedtuple
+import itertools
 import logging
+import os
+import re
 import select
 import socket
 import ssl
 import struct
+import threading
 import time
 
+try:
+    import selectors
+except ImportError:  # pragma: no cover
+    # Python 2.7
+    selectors = None
+
+from ._compat import bytearray_hex, string_types, text_type
 from .utils import json_dumps, chunk, compact_dict
 from .exceptions import (
     APNSError,
@@ -67,9 +78,13 @@ APNS_DEFAULT_BATCH_SIZE = 100
 APNS_DEFAULT_ERROR_TIMEOUT = 10
 APNS_DEFAULT_MAX_PAYLOAD_LENGTH = 0
 APNS_DEFAULT_RETRIES = 5
+APNS_DEFAULT_CONNECTIONS = 1
+APNS_DEFAULT_IDLE_TIMEOUT = 60 * 5
+APNS_DEFAULT_SOCKET_TIMEOUT = 10
 
 # Constants derived from http://goo.gl/wFVr2S
 APNS_PUSH_COMMAND = 2
+APNS_PUSH_FRAME_HEADER_LEN = 5
 APNS_PUSH_FRAME_ITEM_COUNT = 5
 APNS_PUSH_FRAME_ITEM_PREFIX_LEN = 3
 APNS_PUSH_IDENTIFIER_LEN = 4
@@ -79,7 +94,15 @@ APNS_PUSH_PRIORITY_LEN = 1
 APNS_ERROR_RESPONSE_COMMAND = 8
 APNS_ERROR_RESPONSE_LEN = 6
 APNS_FEEDBACK_HEADER_LEN = 6
+APNS_FEEDBACK_READ_SIZE = 65536
+
+# TCP keepalive settings used to detect dead connections: start probing after
+# 60 seconds of inactivity, probe every 10 seconds, give up after 3 probes.
+APNS_TCP_KEEPIDLE = 60
+APNS_TCP_KEEPINTVL = 10
+APNS_TCP_KEEPCNT = 3
 APNS_MAX_NOTIFICATION_SIZE = 2048
+APNS_FRAME_STRUCT_CACHE_SIZE = 128
 
 #: Indicates that the push message should be sent at a time that conserves
 #: power on the device receiving it.
@@ -91,9 +114,36 @@ APNS_LOW_PRIORITY = 5
 #: ``content_available`` key.
 APNS_HIGH_PRIORITY = 10
 
+# SSL contexts and the modification time of the certificate they were loaded
+# from keyed by certificate path. See :func:`create_ssl_context`.
+_ssl_contexts = {}
+_ssl_contexts_lock = threading.Lock()
+
+# Device tokens are hex strings of any even length.
+_token_re = re.compile(r"\A(?:[0-9a-fA-F]{2})+\Z")
+
+# Header of each feedback record: timestamp and token length.
+_feedback_header = struct.Struct("!LH")
+
+# Error response: command, status code and notification identifier.
+_error_response = struct.Struct(">BBI")
+
+# Compiled push frame structs keyed by token and message length. See
+# :func:`get_frame_struct`.
+_frame_structs = {}
+
 
 class APNSClient(object):
-    """APNS client class."""
+    """
+    APNS client class.
+
+    The client keeps its connections open between sends so they should be
+    closed with :meth:`close` when done. The client can also be used as a
+    context manager which closes its connections on exit.
+
+    .. versionchanged:: 1.7.0
+        Added context manager support.
+    """
 
     host = APNS_HOST
     port = APNS_PORT
@@ -108,6 +158,8 @@ class APNSClient(object):
         default_batch_size=APNS_DEFAULT_BATCH_SIZE,
         default_max_payload_length=APNS_DEFAULT_MAX_PAYLOAD_LENGTH,
         default_retries=APNS_DEFAULT_RETRIES,
+        default_connections=APNS_DEFAULT_CONNECTIONS,
+        idle_timeout=APNS_DEFAULT_IDLE_TIMEOUT,
     ):
         self.certificate = certificate
         self.default_error_timeout = default_error_timeout
@@ -115,7 +167,17 @@ class APNSClient(object):
         self.default_batch_size = default_batch_size
         self.default_max_payload_length = default_max_payload_length
         self.default_retries = default_retries
+        self.default_connections = default_connections
+        self.idle_timeout = idle_timeout
         self._conn = None
+        self._extra_conns = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     @property
     def conn(self):
@@ -124,17 +186,34 @@ class APNSClient(object):
             self._conn = self.create_connection()
         return self._conn
 
+    def get_connections(self, count):
+        """
+        Return list of `count` APNS connections to push server.
+
+        The first connection is always :attr:`conn`. Additional connections are
+        created as needed and kept open for reuse by later sends.
+        """
+        while len(self._extra_conns) < count - 1:
+            self._extra_conns.append(self.create_connection())
+        return [self.conn] + self._extra_conns[: count - 1]
+
     def create_connection(self):
         """Create and return new APNS connection to push server."""
-        return APNSConnection(self.host, self.port, self.certificate)
+        return APNSConnection(
+            self.host, self.port, self.certificate, idle_timeout=self.idle_timeout
+        )
 
     def create_feedback_connection(self):
         """Create and return new APNS connection to feedback server."""
         return APNSConnection(self.feedback_host, self.feedback_port, self.certificate)
 
     def close(self):
-        """Close APNS connection."""
-        self.conn.close()
+        """Close APNS connections."""
+        with self._lock:
+            self.conn.close()
+
+            for conn in self._extra_conns:
+                conn.close()
 
     def send(
         self,
@@ -146,6 +225,7 @@ class APNSClient(object):
         error_timeout=None,
         max_payload_length=None,
         retries=None,
+        connections=None,
         **options
     ):
         """
@@ -174,6 +254,15 @@ class APNSClient(object):
             retries (int, optional): Number of times to retry when the send
                 operation fails. Defaults to ``None`` which uses
                 :attr:`default_retries`.
+            connections (int, optional): Maximum number of connections to
+                send notifications over in parallel. Bulk notifications are
+                split into contiguous groups, one per connection, as long as
+                each group has at least `batch_size` notifications. If sending
+                over any connection fails with an unexpected error (e.g. a
+                socket error after all retries), that error is raised once
+                every connection has finished and the responses from the other
+                connections are discarded. Defaults to ``None`` which uses
+                :attr:`default_connections`.
 
         Keyword Args:
             badge (int, optional): Badge number count for alert. Defaults to
@@ -241,6 +330,9 @@ class APNSClient(object):
 
         .. versionchanged:: 1.4.0
             Added ``retries`` argument.
+
+        .. versionchanged:: 1.7.0
+            Added ``connections`` argument.
         """
         if not isinstance(ids, (list, tuple)):
             ids = [ids]
@@ -270,9 +362,88 @@ class APNSClient(object):
         if retries is None:
             retries = self.default_retries
 
-        stream = APNSMessageStream(ids, message, expiration, priority, batch_size)
+        if connections is None:
+            connections = self.default_connections
+
+        # Don't split notifications into groups smaller than a batch.
+        connections = max(min(connections, len(ids) // batch_size), 1)
+
+        # Connections are shared between calls so only one thread at a time
+        # may write to them.
+        with self._lock:
+            if connections > 1:
+                return self._send_parallel(
+                    ids,
+                    message,
+                    expiration,
+                    priority,
+                    batch_size,
+                    error_timeout,
+                    retries,
+                    connections,
+                )
+
+            stream = APNSMessageStream(ids, message, expiration, priority, batch_size)
 
-        return self.conn.sendall(stream, error_timeout, retries=retries)
+            return self.conn.sendall(stream, error_timeout, retries=retries)
+
+    def _send_parallel(
+        self,
+        ids,
+        message,
+        expiration,
+        priority,
+        batch_size,
+        error_timeout,
+        retries,
+        connections,
+    ):
+        """Send notifications split across multiple connections in parallel."""
+        size = (len(ids) + connections - 1) // connections
+        offsets = list(range(0, len(ids), size))
+        conns = self.get_connections(len(offsets))
+        results = [None] * len(offsets)
+
+        log.debug(
+            "Sending {0} notifications to APNS over {1} connections.".format(
+                len(ids), len(offsets)
+            )
+        )
+
+        def sendall(index, conn, offset):
+            stream = APNSMessageStream(
+                ids[offset : offset + size], message, expiration, priority, batch_size
+            )
+
+            try:
+                results[index] = conn.sendall(stream, error_timeout, retries=retries)
+            except Exception as ex:
+                results[index] = ex
+
+        threads = [
+            threading.Thread(target=sendall, args=(index, conn, offset))
+            for index, (conn, offset) in enumerate(zip(conns, offsets))
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        errors = []
+
+        for offset, result in zip(offsets, results):
+            if isinstance(result, Exception):
+                raise result
+
+            # Error identifiers are relative to each group of notifications so
+            # they need to be mapped back to the index of the token in `ids`.
+            errors += [
+                error.__class__(error.identifier + offset) for error in result.errors
+            ]
+
+        return APNSResponse(ids, message, errors)
 
     def get_expired_tokens(self):
         """
@@ -303,13 +474,27 @@ class APNSSandboxClient(APNSClient):
 
 
 class APNSConnection(object):
-    """Manager for APNS socket connection."""
+    """
+    Manager for APNS socket connection.
 
-    def __init__(self, host, port, certificate):
+    The connection is kept open between sends. Since APNS may silently drop
+    connections that have been idle for a while, a connection that has been
+    idle for longer than `idle_timeout` seconds is re-established before it is
+    used again. Set `idle_timeout` to ``None`` to never expire the connection.
+    """
+
+    def __init__(
+        self, host, port, certificate, idle_timeout=APNS_DEFAULT_IDLE_TIMEOUT
+    ):
         self.host = host
         self.port = port
         self.certificate = certificate
+        self.idle_timeout = idle_timeout
+        self.last_used = None
+        self.session = None
+        self.session_context = None
         self.sock = None
+        self.read_selector = None
 
     def connect(self):
         """
@@ -325,7 +510,23 @@ class APNSConnection(object):
             "certificate at {2}".format(self.host, self.port, self.certificate)
         )
 
-        self.sock = create_socket(self.host, self.port, self.certificate)
+        session = self.session
+
+        if session is not None and (
+            create_ssl_context(self.certificate) is not self.session_context
+        ):
+            # A TLS session can only be resumed by the SSL context that
+            # established it.
+            session = None
+
+        self.sock = create_socket(
+            self.host, self.port, self.certificate, session=session
+        )
+
+        if selectors is not None:
+            # Register the socket once per connection instead of passing it to
+            # select() each time it's checked for a response.
+            self.read_selector = create_selector(self.sock, selectors.EVENT_READ)
 
         log.debug(
             "Established connection to APNS on {0}:{1}.".format(self.host, self.port)
@@ -335,8 +536,25 @@ class APNSConnection(object):
         """Disconnect from APNS server."""
         if self.sock:
             log.debug("Closing connection to APNS.")
+            # Hold onto the TLS session so that reconnecting can resume it.
+            self.session = getattr(self.sock, "session", None)
+            self.session_context = getattr(self.sock, "context", None)
             self.sock.close()
+
+        if self.read_selector is not None:
+            self.read_selector.close()
+
         self.sock = None
+        self.read_selector = None
+
+    def is_idle(self):
+        """Return whether connection has been idle for longer than `idle_timeout`."""
+        return bool(
+            self.sock
+            and self.idle_timeout
+            and self.last_used is not None
+            and time.time() - self.last_used > self.idle_timeout
+        )
 
     @property
     def client(self):
@@ -356,7 +574,12 @@ class APNSConnection(object):
     def readable(self, timeout):
         """Return whether connection is readable."""
         try:
-            return select.select([self.client], [], [], timeout)[0]
+            sock = self.client
+
+            if self.read_selector is None:  # pragma: no cover
+                return select.select([sock], [], [], timeout)[0]
+
+            return self.read_selector.select(timeout)
         except Exception:  # pragma: no cover
             log.debug("Error while waiting for APNS socket to become " "readable.")
             self.close()
@@ -364,33 +587,44 @@ class APNSConnection(object):
 
     def read(self, buffsize, timeout=10):
         """Return read data up to `buffsize`."""
-        data = b""
+        # Collect chunks and join them once instead of concatenating each chunk
+        # onto the data read so far.
+        chunks = []
+        size = 0
 
         while True:
             if not self.readable(timeout):  # pragma: no cover
                 self.close()
                 raise socket.timeout
 
-            chunk = self.client.read(buffsize - len(data))
-            data += chunk
+            chunk = self.client.read(buffsize - size)
+            chunks.append(chunk)
+            size += len(chunk)
 
-            if not chunk or len(data) >= buffsize or not timeout:
+            if not chunk or size >= buffsize or not timeout:
                 # Either we've read all data or this is a nonblocking read.
                 break
 
-        return data
+        return b"".join(chunks)
 
-    def write(self, data, timeout=10):
-        """Write data to socket."""
-        if not self.writable(timeout):  # pragma: no cover
-            self.close()
-            raise socket.timeout
+    def write(self, data, timeout=APNS_DEFAULT_SOCKET_TIMEOUT):
+        """
+        Write data to socket.
+
+        The socket is almost always writable so data is sent without polling it
+        first. Instead, the socket's timeout limits how long sending may block
+        and ``socket.timeout`` is raised if it is exceeded.
+        """
+        sock = self.client
+
+        if sock.gettimeout() != timeout:
+            sock.settimeout(timeout)
 
         log.debug(
             "Sending APNS notification batch containing {0} bytes.".format(len(data))
         )
 
-        return self.client.sendall(data)
+        return sock.sendall(data)
 
     def check_error(self, timeout=10):
         """Check for APNS errors."""
@@ -399,7 +633,9 @@ class APNSConnection(object):
             return
 
         try:
-            data = self.read(APNS_ERROR_RESPONSE_LEN, timeout=0)
+            # The socket is known to be readable so read from it directly
+            # instead of polling it again.
+            data = self.client.read(APNS_ERROR_RESPONSE_LEN)
         except socket.error as ex:  # pragma: no cover
             log.error("Could not read response: {0}.".format(ex))
             self.close()
@@ -408,14 +644,12 @@ class APNSConnection(object):
         if not data:  # pragma: no cover
             return
 
-        command = struct.unpack(">B", data[:1])[0]
+        command, code, identifier = _error_response.unpack(data)
 
         if command != APNS_ERROR_RESPONSE_COMMAND:  # pragma: no cover
             self.close()
             return
 
-        code, identifier = struct.unpack(">BI", data[1:])
-
         log.debug(
             "Received APNS error response with "
             "code={0} for identifier={1}.".format(code, identifier)
@@ -425,7 +659,12 @@ class APNSConnection(object):
         raise_apns_server_error(code, identifier)
 
     def send(self, frames, retries=APNS_DEFAULT_RETRIES):
-        """Send stream of frames to APNS server."""
+        """
+        Send stream of frames to APNS server.
+
+        Frames are written one batch at a time with a non-blocking check for an
+        error response after each batch.
+        """
         if retries <= 0:  # pragma: no cover
             retries = 1
 
@@ -452,6 +691,11 @@ class APNSConnection(object):
                 log.error("Could not send frame to server: {0}.".format(last_ex))
                 raise APNSTimeoutError(current_identifier)
 
+            # Each frame yielded by the stream is a whole batch of
+            # notifications so errors are only polled for once per batch. Don't
+            # check for errors per notification: that would add a poll for
+            # every notification while APNS closes the connection after an
+            # error anyway, so the remaining frames are resent after a seek.
             self.check_error(0)
             current_identifier = frames.next_identifier
 
@@ -469,31 +713,44 @@ class APNSConnection(object):
         """
         log.debug("Preparing to send {0} notifications to APNS.".format(len(stream)))
 
+        if self.is_idle():
+            log.debug("Reconnecting idle connection to APNS.")
+            self.close()
+
         errors = []
 
-        while True:
-            try:
-                self.send(stream, retries=retries)
-
-                # Perform the final error check here before exiting. A large
-                # enough timeout should be used so that no errors are missed.
-                self.check_error(error_timeout)
-            except APNSServerError as ex:
-                errors.append(ex)
-                next_identifier = ex.identifier + 1
-                stream.seek(next_identifier)
-
-                if ex.fatal:
-                    # We can't continue due to a fatal error. Go ahead and
-                    # convert remaining notifications to errors.
-                    errors += [
-                        APNSUnsendableError(next_identifier + i)
-                        for i, _ in enumerate(stream.peek())
-                    ]
+        try:
+            while True:
+                try:
+                    self.send(stream, retries=retries)
+
+                    # Perform the final error check here before exiting. A large
+                    # enough timeout should be used so that no errors are missed.
+                    self.check_error(error_timeout)
+                except APNSServerError as ex:
+                    errors.append(ex)
+                    next_identifier = ex.identifier + 1
+                    stream.seek(next_identifier)
+
+                    if ex.fatal:
+                        # We can't continue due to a fatal error. Go ahead and
+                        # convert remaining notifications to errors.
+                        errors += [
+                            APNSUnsendableError(next_identifier + i)
+                            for i, _ in enumerate(stream.peek())
+                        ]
+                        break
+
+                if stream.eof():
                     break
+        except Exception:
+            # The connection is in an unknown state after an unexpected error
+            # (e.g. a partially written frame) so don't reuse it.
+            log.debug("Unexpected error while sending to APNS. Closing connection.")
+            self.close()
+            raise
 
-            if stream.eof():
-                break
+        self.last_used = time.time()
 
         log.debug("Sent {0} notifications to APNS.".format(len(stream)))
 
@@ -543,22 +800,13 @@ class APNSMessage(object):
         self.thread_id = thread_id
         self.extra = extra
         self.max_payload_length = max_payload_length
+        self._json = None
 
     def _construct_dict(self, message=None):
         """Return message as dictionary, overriding message."""
         msg = {}
 
-        if any(
-            [
-                self.title,
-                self.title_loc_key,
-                self.title_loc_args,
-                self.action_loc_key,
-                self.loc_key,
-                self.loc_args,
-                self.launch_image,
-            ]
-        ):
+        if self._has_alert_extras():
             alert = {
                 "body": message,
                 "title": self.title,
@@ -589,20 +837,40 @@ class APNSMessage(object):
 
         return msg
 
+    def _has_alert_extras(self):
+        """Return whether alert needs to be serialized as a dictionary."""
+        return bool(
+            self.title
+            or self.title_loc_key
+            or self.title_loc_args
+            or self.action_loc_key
+            or self.loc_key
+            or self.loc_args
+            or self.launch_image
+        )
+
     def _construct_truncated_dict(self, message):
         """Return truncated message as dictionary."""
+        data = self._construct_dict(message)
+
+        if len(json_dumps(data)) <= self.max_payload_length:
+            return data
+
+        # The serialized length only grows as more of the message is kept so
+        # binary search for the longest truncated message that still fits.
         msg = None
-        ending = ""
+        low = 1
+        high = len(message) - 1
 
-        while message:
-            data = self._construct_dict(message + ending)
+        while low <= high:
+            mid = (low + high) // 2
+            data = self._construct_dict(message[:mid] + "...")
 
             if len(json_dumps(data)) <= self.max_payload_length:
                 msg = data
-                break
-
-            message = message[0:-1]
-            ending = "..."
+                low = mid + 1
+            else:
+                high = mid - 1
 
         if msg is None:  # pragma: no cover
             msg = self._construct_dict()
@@ -616,8 +884,52 @@ class APNSMessage(object):
 
         return self._construct_dict(self.message)
 
+    def _is_simple_alert(self):
+        """
+        Return whether message only consists of an alert string with an optional
+        badge and sound.
+        """
+        return (
+            isinstance(self.message, string_types)
+            and not self.max_payload_length
+            and not self.extra
+            and not self._has_alert_extras()
+            and not self.content_available
+            and not self.mutable_content
+            and self.category is None
+            and self.thread_id is None
+        )
+
     def to_json(self):
-        """Return message as JSON string."""
+        """
+        Return message as JSON string.
+
+        The serialized message is cached so the message should not be modified
+        after it has been serialized.
+        """
+        if self._json is None:
+            self._json = self._to_json()
+
+        return self._json
+
+    def _to_json(self):
+        """Serialize message to JSON string."""
+        if self._is_simple_alert():
+            # Fast path for the most common kind of message which serializes it
+            # directly instead of building and serializing the full dictionary.
+            # Keys are written in sorted order to match json_dumps.
+            parts = [b'{"aps":{"alert":', json_dumps(self.message)]
+
+            if self.badge is not None:
+                parts += [b',"badge":', json_dumps(self.badge)]
+
+            if self.sound is not None:
+                parts += [b',"sound":', json_dumps(self.sound)]
+
+            parts.append(b"}}")
+
+            return b"".join(parts)
+
         return json_dumps(self.to_dict())
 
     def __len__(self):
@@ -630,7 +942,13 @@ class APNSMessageStream(object):
 
     def __init__(self, tokens, message, expiration, priority, batch_size=1):
         self.tokens = tokens
+        # Decode tokens up front so that resuming iteration after an error
+        # doesn't decode the remaining tokens again.
+        self.token_bins = [unhexlify(token) for token in tokens]
         self.message = message
+        # The serialized message is the same for every token so only serialize
+        # it once instead of each time iteration is resumed after an error.
+        self.payload = message.to_json()
         self.expiration = expiration
         self.priority = priority
         self.batch_size = batch_size
@@ -651,7 +969,12 @@ class APNSMessageStream(object):
         self.next_identifier = identifier
 
     def peek(self, n=None):
-        return self.tokens[self.next_identifier : n]
+        """
+        Return iterator over the next `n` unprocessed tokens or all remaining
+        tokens if `n` is ``None``.
+        """
+        stop = None if n is None else self.next_identifier + n
+        return itertools.islice(self.tokens, self.next_identifier, stop)
 
     def eof(self):
         """Return whether all tokens have been processed."""
@@ -659,45 +982,71 @@ class APNSMessageStream(object):
 
     def pack(self, token, identifier, message, expiration, priority):
         """Return a packed APNS socket frame for given token."""
-        token_bin = unhexlify(token)
-        token_len = len(token_bin)
-        message_len = len(message)
-
-        # |CMD|FRAMELEN|{token}|{message}|{id:4}|{expiration:4}|{priority:1}
-        # 5 items, each 3 bytes prefix, then each item length
-        frame_len = (
-            APNS_PUSH_FRAME_ITEM_COUNT * APNS_PUSH_FRAME_ITEM_PREFIX_LEN
-            + token_len
-            + message_len
-            + APNS_PUSH_IDENTIFIER_LEN
-            + APNS_PUSH_EXPIRATION_LEN
-            + APNS_PUSH_PRIORITY_LEN
+        return bytes(
+            self.pack_frames(
+                [unhexlify(token)], identifier, message, expiration, priority
+            )
         )
-        frame_fmt = ">BIBH{0}sBH{1}sBHIBHIBHB".format(token_len, message_len)
-
-        # NOTE: Each bare int below is the corresponding frame item ID.
-        frame = struct.pack(
-            frame_fmt,
-            APNS_PUSH_COMMAND,
-            frame_len,  # BI
-            1,
-            token_len,
-            token_bin,  # BH{token_len}s
-            2,
-            message_len,
-            message,  # BH{message_len}s
-            3,
-            APNS_PUSH_IDENTIFIER_LEN,
-            identifier,  # BHI
-            4,
-            APNS_PUSH_EXPIRATION_LEN,
-            expiration,  # BHI
-            5,
-            APNS_PUSH_PRIORITY_LEN,
-            priority,
-        )  # BHB
-
-        return frame
+
+    def pack_frames(self, token_bins, identifier, message, expiration, priority):
+        """
+        Return buffer of packed APNS socket frames for given binary tokens.
+
+        Frames are assigned consecutive identifiers starting at `identifier`.
+        """
+        message_len = len(message)
+        frames = []
+        size = 0
+
+        # Look up each frame's struct once and use it to both size the buffer
+        # and pack the frame.
+        for token_bin in token_bins:
+            token_len = len(token_bin)
+            frame_struct = get_frame_struct(token_len, message_len)
+            frames.append((frame_struct, token_len, token_bin))
+            size += frame_struct.size
+
+        # Pack all frames into a single preallocated buffer so that they are
+        # written to the socket in a single call without creating intermediate
+        # bytes objects for each frame.
+        buff = bytearray(size)
+        offset = 0
+
+        for frame_struct, token_len, token_bin in frames:
+            # |CMD|FRAMELEN|{token}|{message}|{id:4}|{expiration:4}|{priority:1}
+            # The frame length covers the 5 items that follow the command and
+            # frame length header so derive it from the struct's size instead
+            # of summing the item lengths for every frame.
+            frame_size = frame_struct.size
+            frame_len = frame_size - APNS_PUSH_FRAME_HEADER_LEN
+
+            # NOTE: Each bare int below is the corresponding frame item ID.
+            frame_struct.pack_into(
+                buff,
+                offset,
+                APNS_PUSH_COMMAND,
+                frame_len,  # BI
+                1,
+                token_len,
+                token_bin,  # BH{token_len}s
+                2,
+                message_len,
+                message,  # BH{message_len}s
+                3,
+                APNS_PUSH_IDENTIFIER_LEN,
+                identifier,  # BHI
+                4,
+                APNS_PUSH_EXPIRATION_LEN,
+                expiration,  # BHI
+                5,
+                APNS_PUSH_PRIORITY_LEN,
+                priority,
+            )  # BHB
+
+            offset += frame_size
+            identifier += 1
+
+        return buff
 
     def __len__(self):
         """Return count of number of notifications."""
@@ -705,23 +1054,28 @@ class APNSMessageStream(object):
 
     def __iter__(self):
         """Iterate through each device token and yield APNS socket frame."""
-        message = self.message.to_json()
-
-        data = b""
-        tokens = self.tokens[self.next_identifier :]
-
-        for token_chunk in chunk(tokens, self.batch_size):
-            for token in token_chunk:
-                log.debug("Preparing notification for APNS token {0}".format(token))
-
-                data += self.pack(
-                    token, self.next_identifier, message, self.expiration, self.priority
-                )
-                self.next_identifier += 1
+        payload = self.payload
+        expiration = self.expiration
+        priority = self.priority
+        tokens = self.tokens
+        token_bins = self.token_bins[self.next_identifier :]
+        pack_frames = self.pack_frames
+        # Avoid formatting a debug message per token when it won't be logged.
+        debug = log.isEnabledFor(logging.DEBUG)
+
+        for token_chunk in chunk(token_bins, self.batch_size):
+            identifier = self.next_identifier
+
+            if debug:
+                for token in tokens[identifier : identifier + len(token_chunk)]:
+                    log.debug(
+                        "Preparing notification for APNS token {0}".format(token)
+                    )
 
-            yield data
+            buff = pack_frames(token_chunk, identifier, payload, expiration, priority)
+            self.next_identifier = identifier + len(token_chunk)
 
-            data = b""
+            yield buff
 
 
 class APNSFeedbackStream(object):
@@ -732,23 +1086,35 @@ class APNSFeedbackStream(object):
 
     def __iter__(self):
         """Iterate through and yield expired device tokens."""
-        header_format = "!LH"
+        # Read the stream in large chunks instead of issuing two reads per
+        # record and parse as many complete records as each chunk contains.
+        buff = bytearray()
 
         while True:
-            data = self.conn.read(APNS_FEEDBACK_HEADER_LEN)
+            data = self.conn.read(APNS_FEEDBACK_READ_SIZE)
 
             if not data:
                 break
 
-            timestamp, token_len = struct.unpack(header_format, data)
-            token_data = self.conn.read(token_len)
+            buff.extend(data)
+            pos = 0
+
+            while len(buff) - pos >= APNS_FEEDBACK_HEADER_LEN:
+                timestamp, token_len = _feedback_header.unpack_from(buff, pos)
+                start = pos + APNS_FEEDBACK_HEADER_LEN
+                end = start + token_len
+
+                if len(buff) < end:
+                    # Incomplete record. Wait for the rest in the next chunk.
+                    break
 
-            if token_data:
-                token = struct.unpack("{0}s".format(token_len), token_data)
-                token = hexlify(token[0]).decode("utf8")
+                token = bytearray_hex(buff[start:end])
+                pos = end
 
                 yield APNSExpiredToken(token, timestamp)
 
+            del buff[:pos]
+
 
 class APNSResponse(object):
     """
@@ -779,7 +1145,8 @@ class APNSResponse(object):
             self.failures.append(tok)
             self.token_errors[tok] = err
 
-        self.successes = [token for token in tokens if token not in self.failures]
+        failures = set(self.failures)
+        self.successes = [token for token in tokens if token not in failures]
 
 
 class APNSExpiredToken(namedtuple("APNSExpiredToken", ["token", "timestamp"])):
@@ -794,21 +1161,98 @@ class APNSExpiredToken(namedtuple("APNSExpiredToken", ["token", "timestamp"])):
     pass
 
 
-def create_socket(host, port, certificate):
-    """Create a socket connection to the APNS server."""
+def get_frame_struct(token_len, message_len):
+    """
+    Return compiled struct for packing a push frame whose token and message
+    items have the given lengths.
+
+    Structs are cached since the same lengths are used for every notification
+    in a send operation.
+    """
+    key = (token_len, message_len)
+    frame_struct = _frame_structs.get(key)
+
+    if frame_struct is None:
+        if len(_frame_structs) >= APNS_FRAME_STRUCT_CACHE_SIZE:
+            _frame_structs.clear()
+
+        frame_struct = struct.Struct(
+            ">BIBH{0}sBH{1}sBHIBHIBHB".format(token_len, message_len)
+        )
+        _frame_structs[key] = frame_struct
+
+    return frame_struct
+
+
+def create_ssl_context(certificate):
+    """
+    Return SSL context loaded with the certificate chain at `certificate`.
+
+    Contexts are cached per certificate so that the certificate chain is only
+    parsed once and so that TLS sessions established by one connection can be
+    resumed by the next one. If the certificate file is modified (e.g. when a
+    certificate is renewed), it's loaded into a new context which replaces the
+    cached one so that sessions established with the old certificate are no
+    longer resumed.
+    """
     try:
-        with open(certificate, "r") as fileobj:
-            fileobj.read()
+        mtime = os.path.getmtime(certificate)
     except Exception as ex:
         raise APNSAuthError(
             "The certificate at {0} is not readable: {1}".format(certificate, ex)
         )
 
-    sock = socket.socket()
+    # Hold the lock while loading so that connections created concurrently
+    # (e.g. when sending in parallel) share a single context.
+    with _ssl_contexts_lock:
+        context, loaded_mtime = _ssl_contexts.get(certificate, (None, None))
+
+        if context is not None and mtime == loaded_mtime:
+            return context
 
-    sock = ssl.wrap_socket(sock, certfile=certificate, do_handshake_on_connect=False)
-    sock.connect((host, port))
-    sock.setblocking(0)
+        if hasattr(ssl, "PROTOCOL_TLS_CLIENT"):
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        else:  # pragma: no cover
+            context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+
+        if hasattr(context, "minimum_version"):
+            context.minimum_version = ssl.TLSVersion.TLSv1_2
+
+        try:
+            context.load_cert_chain(certificate)
+        except Exception as ex:
+            raise APNSAuthError(
+                "The certificate at {0} is not readable: {1}".format(certificate, ex)
+            )
+
+        _ssl_contexts[certificate] = (context, mtime)
+
+    return context
+
+
+def create_socket(host, port, certificate, session=None):
+    """
+    Create a socket connection to the APNS server.
+
+    If `session` is given, the TLS session it represents will be resumed
+    instead of performing a full handshake. If the session can't be resumed
+    with the current SSL context, it's discarded.
+    """
+    context = create_ssl_context(certificate)
+
+    try:
+        sock = connect_ssl_socket(context, host, port, session=session)
+    except ValueError:
+        if session is None:
+            raise
+
+        log.debug(
+            "Discarding TLS session that can't be resumed with the current "
+            "SSL context."
+        )
+        sock = connect_ssl_socket(context, host, port)
 
     log.debug("Performing SSL handshake with APNS on {0}:{1}".format(host, port))
 
@@ -817,33 +1261,80 @@ def create_socket(host, port, certificate):
     return sock
 
 
+def connect_ssl_socket(context, host, port, session=None):
+    """
+    Return SSL socket wrapped by `context` and connected to `host` and `port`.
+
+    The SSL handshake isn't performed. The socket is closed if connecting
+    fails.
+    """
+    options = {"do_handshake_on_connect": False, "server_hostname": host}
+
+    if session is not None:
+        options["session"] = session
+
+    sock = socket.socket()
+
+    try:
+        set_socket_options(sock)
+        sock = context.wrap_socket(sock, **options)
+        sock.connect((host, port))
+    except Exception:
+        sock.close()
+        raise
+
+    # Use a timeout instead of a non-blocking socket so that writes only wait
+    # for the socket when its send buffer is full. Reads are still only done
+    # once the socket is known to be readable.
+    sock.settimeout(APNS_DEFAULT_SOCKET_TIMEOUT)
+
+    return sock
+
+
+def create_selector(sock, events):
+    """Return selector with `sock` registered for `events`."""
+    selector = selectors.DefaultSelector()
+    selector.register(sock, events)
+    return selector
+
+
+def set_socket_options(sock):
+    """
+    Configure TCP options of APNS socket.
+
+    Nagle's algorithm is disabled since notifications are already written in
+    batches and each batch should be sent immediately. Keepalive is enabled so
+    that a dead connection is detected before the next write to it.
+    """
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+
+    # These options are only available on some platforms (e.g. Linux).
+    for name, value in (
+        ("TCP_KEEPIDLE", APNS_TCP_KEEPIDLE),
+        ("TCP_KEEPINTVL", APNS_TCP_KEEPINTVL),
+        ("TCP_KEEPCNT", APNS_TCP_KEEPCNT),
+    ):
+        if hasattr(socket, name):
+            sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, name), value)
+
+
 def do_ssl_handshake(sock):
-    """Perform SSL socket handshake for non-blocking socket."""
-    while True:
-        try:
-            sock.do_handshake()
-            break
-        except ssl.SSLError as ex:  # pragma: no cover
-            # For some reason, pylint on TravisCI's Python 2.7 platform
-            # complains that these members don't exist. Add a disable flag to
-            # bypass this.
-            # pylint: disable=no-member
-            if ex.args[0] == ssl.SSL_ERROR_WANT_READ:
-                select.select([sock], [], [])
-            elif ex.args[0] == ssl.SSL_ERROR_WANT_WRITE:
-                select.select([], [sock], [])
-            else:
-                raise
+    """
+    Perform SSL socket handshake.
+
+    The socket is in timeout mode so the handshake blocks until it completes
+    or the socket times out.
+    """
+    sock.do_handshake()
 
 
 def valid_token(token):
     """Return whether token is in valid format."""
-    try:
-        valid = token and unhexlify(token)
-    except Exception:
-        valid = False
+    if isinstance(token, bytes):
+        token = token.decode("latin-1")
 
-    return valid
+    return isinstance(token, text_type) and _token_re.match(token) is not None
 
 
 def invalid_tokens(tokens):
@@ -20,8 +20,6 @@ For more details regarding Google's GCM documentation, consult the following:
 from collections import namedtuple
 import logging
 
-import requests
-
 from .utils import chunk, compact_dict, json_loads, json_dumps
 from .exceptions import GCMError, GCMAuthError, gcm_server_errors
 from ._compat import iteritems
@@ -136,6 +134,10 @@ class GCMConnection(object):
     """Wrapper around requests session bound to GCM config."""
 
     def __init__(self, api_key, url=GCM_URL):
+        # Importing requests is slow relative to the rest of the package so
+        # defer it until a GCM connection is actually needed.
+        import requests
+
         self.api_key = api_key
         self.url = url
 
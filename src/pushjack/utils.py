@@ -6,6 +6,11 @@ try:
 except ImportError:
     import json
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from ._compat import range_ as range, string_types, iteritems
 
 
@@ -15,11 +20,30 @@ def chunk(seq, size):
 
 
 def compact_dict(dct):
-    return dict((key, value) for key, value in iteritems(dct) if value is not None)
+    """Return copy of `dct` without keys whose value is ``None``."""
+    return {key: value for key, value in iteritems(dct) if value is not None}
 
 
 def json_dumps(data):
-    """Standardized json.dumps function with separators and sorted keys set."""
+    """
+    Standardized json.dumps function with separators and sorted keys set.
+
+    Uses ``orjson`` when it's installed and falls back to ``json`` for data
+    that ``orjson`` can't serialize.
+
+    Note:
+        ``orjson`` encodes non-ASCII characters as UTF-8 while ``json``
+        escapes them as ``\\uXXXX`` sequences. Serialized data containing
+        non-ASCII characters is therefore shorter when ``orjson`` is installed
+        which also changes where messages are truncated to fit
+        ``max_payload_length``.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            pass
+
     return json.dumps(data, separators=(",", ":"), sort_keys=True).encode("utf8")
 
 
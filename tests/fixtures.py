@@ -80,6 +80,8 @@ def apns_socket_factory(connect=None):
         sock._sock = socket.socket()
 
     sock.fileno = lambda: sock._sock.fileno()
+    # Sockets don't have a TLS session to resume unless a test sets one.
+    sock.session = None
 
     return sock
 
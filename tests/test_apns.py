@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
 
+from binascii import unhexlify
 import datetime
+import logging
+import os
 import socket
+import threading
+import time
 
 import mock
 import pytest
@@ -14,6 +19,7 @@ from .fixtures import (
     apns_feedback_socket_factory,
     apns_create_error_socket,
     apns_socket,
+    apns_socket_factory,
     apns_tokens,
     parametrize,
     TCP_HOST,
@@ -139,15 +145,29 @@ from .fixtures import (
     ],
 )
 def test_apns_send(apns_client, apns_socket, tokens, alert, extra, expected):
-    with mock.patch("pushjack.apns.APNSMessageStream.pack") as pack_frame:
+    with mock.patch(
+        "pushjack.apns.APNSMessageStream.pack_frames", return_value=b""
+    ) as pack_frames:
         apns_client.send(tokens, alert, **extra)
 
         if not isinstance(tokens, list):
             tokens = [tokens]
 
-        for identifier, token in enumerate(tokens):
-            call = mock.call(token, identifier, expected[0], *expected[2:])
-            assert call in pack_frame.mock_calls
+        payload, _, expiration, priority = expected
+        sent = []
+
+        for call in pack_frames.call_args_list:
+            token_bins, identifier = call[0][:2]
+
+            assert call[0][2:] == (payload, expiration, priority)
+
+            for token_bin in token_bins:
+                sent.append((identifier, token_bin))
+                identifier += 1
+
+        assert sent == [
+            (identifier, unhexlify(token)) for identifier, token in enumerate(tokens)
+        ]
 
         apns_client.close()
 
@@ -194,6 +214,16 @@ def test_valid_token(apns_client, apns_socket, token):
     assert apns_socket.sendall.called
 
 
+@parametrize("token", ["1" * 64, b"1" * 64, "abcdef0123456789ABCDEF" * 2])
+def test_valid_token_format(token):
+    assert apns.valid_token(token)
+
+
+@parametrize("token", ["", "1", "1" * 63, "x" * 64, "1" * 63 + "\n", None, 1])
+def test_invalid_token_format(token):
+    assert not apns.valid_token(token)
+
+
 @parametrize("token", ["1", "x" * 64, "x" * 108])
 def test_invalid_token(apns_client, apns_socket, token):
     with pytest.raises(exceptions.APNSInvalidTokenError) as exc_info:
@@ -205,11 +235,15 @@ def test_invalid_token(apns_client, apns_socket, token):
 def test_apns_use_extra(apns_client, apns_socket):
     test_token = apns_tokens(1)
 
-    with mock.patch("pushjack.apns.APNSMessageStream.pack") as pack_frame:
+    with mock.patch(
+        "pushjack.apns.APNSMessageStream.pack_frames", return_value=b""
+    ) as pack_frames:
         apns_client.send(test_token, "sample", extra={"foo": "bar"}, expiration=30)
 
         expected_payload = b'{"aps":{"alert":"sample"},"foo":"bar"}'
-        pack_frame.assert_called_once_with(test_token, 0, expected_payload, 30, 10)
+        pack_frames.assert_called_once_with(
+            [unhexlify(test_token)], 0, expected_payload, 30, 10
+        )
 
 
 def test_apns_socket_write(apns_client, apns_socket):
@@ -230,18 +264,20 @@ def test_apns_socket_write(apns_client, apns_socket):
 
 @parametrize("exception,alert", [(exceptions.APNSInvalidPayloadSizeError, "_" * 2049)])
 def test_apns_invalid_payload_size(apns_client, exception, alert):
-    with mock.patch("pushjack.apns.APNSMessageStream.pack") as pack_frame:
+    with mock.patch("pushjack.apns.APNSMessageStream.pack_frames") as pack_frames:
         with pytest.raises(exception):
             apns_client.send(apns_tokens(1), alert)
 
-        assert not pack_frame.called
+        assert not pack_frames.called
 
 
 @parametrize("alert", [("_" * 2049)])
 def test_apns_max_payload_length(apns_client, apns_socket, alert):
-    with mock.patch("pushjack.apns.APNSMessageStream.pack") as pack_frame:
+    with mock.patch(
+        "pushjack.apns.APNSMessageStream.pack_frames", return_value=b""
+    ) as pack_frames:
         apns_client.send(apns_tokens(1), alert, max_payload_length=2048)
-        assert pack_frame.called
+        assert pack_frames.called
         apns_client.close()
 
 
@@ -298,16 +334,232 @@ def test_apns_create_socket(tmpdir):
     certificate = tmpdir.join("certifiate.pem")
     certificate.write("content")
 
-    with mock.patch("ssl.wrap_socket") as wrap_socket:
-        wrap_socket.do_handshake = lambda: True
+    with mock.patch("pushjack.apns.create_ssl_context") as create_ssl_context:
+        with mock.patch("socket.socket"):
+            context = create_ssl_context.return_value
 
-        apns.create_socket(TCP_HOST, TCP_PORT, str(certificate))
+            apns.create_socket(TCP_HOST, TCP_PORT, str(certificate))
+
+        create_ssl_context.assert_called_once_with(str(certificate))
+        assert context.wrap_socket.called
+
+        expected = {"do_handshake_on_connect": False, "server_hostname": TCP_HOST}
+
+        assert context.wrap_socket.mock_calls[0][2] == expected
+
+
+def test_apns_create_socket_options():
+    with mock.patch("pushjack.apns.create_ssl_context"):
+        with mock.patch("socket.socket") as sock_class:
+            apns.create_socket(TCP_HOST, TCP_PORT, "certificate.pem")
+
+    sock = sock_class.return_value
+    expected = [
+        mock.call(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+        mock.call(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+    ]
+
+    assert sock.setsockopt.mock_calls[:2] == expected
+
+
+def test_apns_create_socket_session():
+    session = mock.Mock()
+
+    with mock.patch("pushjack.apns.create_ssl_context") as create_ssl_context:
+        with mock.patch("socket.socket"):
+            context = create_ssl_context.return_value
+
+            apns.create_socket(TCP_HOST, TCP_PORT, "certificate.pem", session=session)
+
+        assert context.wrap_socket.mock_calls[0][2]["session"] is session
+
+
+def test_apns_create_socket_discards_rejected_session():
+    session = mock.Mock()
+
+    with mock.patch("pushjack.apns.create_ssl_context") as create_ssl_context:
+        with mock.patch("socket.socket"):
+            context = create_ssl_context.return_value
+            ssl_sock = context.wrap_socket.return_value
+            ssl_sock.connect.side_effect = [
+                ValueError("Session refers to a different SSLContext."),
+                None,
+            ]
+
+            sock = apns.create_socket(
+                TCP_HOST, TCP_PORT, "certificate.pem", session=session
+            )
+
+    assert sock is ssl_sock
+    assert ssl_sock.close.call_count == 1
+    assert context.wrap_socket.mock_calls[0][2]["session"] is session
+    assert "session" not in context.wrap_socket.mock_calls[1][2]
+
+
+def test_apns_create_socket_closed_on_error():
+    with mock.patch("pushjack.apns.create_ssl_context") as create_ssl_context:
+        with mock.patch("socket.socket"):
+            context = create_ssl_context.return_value
+            ssl_sock = context.wrap_socket.return_value
+            ssl_sock.connect.side_effect = socket.error
+
+            with pytest.raises(socket.error):
+                apns.create_socket(TCP_HOST, TCP_PORT, "certificate.pem")
+
+    assert ssl_sock.close.called
+
+
+def test_apns_create_ssl_context_cached(tmpdir):
+    certificate = tmpdir.join("certificate.pem")
+    certificate.write("content")
+    certificate = str(certificate)
+
+    with mock.patch.dict(apns._ssl_contexts, clear=True):
+        with mock.patch("ssl.SSLContext") as ssl_context:
+            ssl_context.side_effect = lambda *args: mock.Mock()
+            context = apns.create_ssl_context(certificate)
+
+            assert apns.create_ssl_context(certificate) is context
+            context.load_cert_chain.assert_called_once_with(certificate)
+
+            mtime = os.path.getmtime(certificate) + 10
+            os.utime(certificate, (mtime, mtime))
+            reloaded = apns.create_ssl_context(certificate)
+
+            assert reloaded is not context
+            reloaded.load_cert_chain.assert_called_once_with(certificate)
+            assert apns.create_ssl_context(certificate) is reloaded
+
+
+def test_apns_create_ssl_context_shared_across_threads(tmpdir):
+    certificate = tmpdir.join("certificate.pem")
+    certificate.write("content")
+    certificate = str(certificate)
+    contexts = []
+
+    def create_ssl_context():
+        contexts.append(apns.create_ssl_context(certificate))
+
+    def load_cert_chain(*args):
+        # Give other threads a chance to race for the cache while loading.
+        time.sleep(0.01)
+
+    with mock.patch.dict(apns._ssl_contexts, clear=True):
+        with mock.patch("ssl.SSLContext") as ssl_context:
+            ssl_context.side_effect = lambda *args: mock.Mock(
+                load_cert_chain=mock.Mock(side_effect=load_cert_chain)
+            )
+            threads = [threading.Thread(target=create_ssl_context) for _ in range(5)]
+
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+    assert ssl_context.call_count == 1
+    assert len(contexts) == 5
+    assert all(context is contexts[0] for context in contexts)
+
+
+def test_apns_connection_resumes_session(apns_client, apns_socket):
+    conn = apns_client.conn
+    apns_socket.session = mock.Mock()
+    conn.connect()
+    conn.close()
+
+    assert conn.session is apns_socket.session
+    assert conn.session_context is apns_socket.context
+
+    with mock.patch(
+        "pushjack.apns.create_ssl_context", return_value=apns_socket.context
+    ), mock.patch(
+        "pushjack.apns.create_socket", return_value=apns_socket_factory()
+    ) as create_socket:
+        conn.connect()
+
+        assert create_socket.mock_calls[0][2] == {"session": apns_socket.session}
+
+
+def test_apns_connection_discards_session_of_other_context(apns_client, apns_socket):
+    conn = apns_client.conn
+    apns_socket.session = mock.Mock()
+    conn.connect()
+    conn.close()
+
+    with mock.patch("pushjack.apns.create_ssl_context"), mock.patch(
+        "pushjack.apns.create_socket", return_value=apns_socket_factory()
+    ) as create_socket:
+        conn.connect()
+
+        assert create_socket.mock_calls[0][2] == {"session": None}
+
+
+def test_apns_connection_discards_session_after_certificate_reload(tmpdir):
+    certificate = tmpdir.join("certificate.pem")
+    certificate.write("content")
+    certificate = str(certificate)
+    conn = apns.APNSConnection(TCP_HOST, TCP_PORT, certificate)
+
+    with mock.patch.dict(apns._ssl_contexts, clear=True), mock.patch(
+        "ssl.SSLContext"
+    ) as ssl_context, mock.patch("pushjack.apns.create_socket") as create_socket:
+        ssl_context.side_effect = lambda *args: mock.Mock()
+        sock = apns_socket_factory()
+        sock.session = mock.Mock()
+        sock.context = apns.create_ssl_context(certificate)
+        create_socket.return_value = sock
+
+        conn.connect()
+        conn.close()
+        conn.connect()
+        conn.close()
+
+        assert create_socket.call_args[1] == {"session": sock.session}
+
+        mtime = os.path.getmtime(certificate) + 10
+        os.utime(certificate, (mtime, mtime))
+        conn.connect()
+
+        assert create_socket.call_args[1] == {"session": None}
+
+        conn.close()
+        sock._sock.close()
+
+
+def test_apns_connection_selectors(apns_client, apns_socket):
+    conn = apns_client.conn
+
+    assert conn.writable(0)
+    assert not conn.readable(0)
+
+    read_selector = conn.read_selector
+    conn.readable(0)
+
+    assert conn.read_selector is read_selector
 
-        assert wrap_socket.called
+    conn.close()
 
-        expected = {"certfile": str(certificate), "do_handshake_on_connect": False}
+    assert conn.read_selector is None
+    assert read_selector.get_map() is None
 
-        assert wrap_socket.mock_calls[0][2] == expected
+
+def test_apns_write_without_polling(apns_client, apns_socket):
+    with mock.patch.object(apns.APNSConnection, "writable") as writable:
+        apns_client.conn.write(b"data", timeout=5)
+
+    assert not writable.called
+    assert mock.call.settimeout(5) in apns_socket.mock_calls
+    assert mock.call.sendall(b"data") in apns_socket.mock_calls
+
+
+def test_apns_client_context_manager(apns_socket):
+    with apns.APNSClient(certificate=None, default_error_timeout=0) as client:
+        client.send(apns_tokens(1), "foo")
+        assert apns_socket.close.call_count == 0
+
+    assert apns_socket.close.call_count == 1
+    assert client.conn.sock is None
 
 
 def test_apns_create_socket_missing_certificate():
@@ -325,3 +577,231 @@ def test_apns_create_socket_empty_certificate(tmpdir):
 
     with pytest.raises(exceptions.APNSAuthError):
         apns.create_socket(TCP_HOST, TCP_PORT, str(certificate))
+
+
+def test_apns_idle_connection_reconnects(apns_client, apns_socket):
+    apns_client.send(apns_tokens(1), "foo")
+    assert apns_socket.close.call_count == 0
+
+    apns_client.conn.last_used -= apns_client.idle_timeout + 1
+    apns_client.send(apns_tokens(1), "foo")
+
+    assert apns_socket.close.call_count == 1
+
+
+def test_apns_connection_without_idle_timeout(apns_socket):
+    conn = apns.APNSConnection(TCP_HOST, TCP_PORT, None, idle_timeout=None)
+    conn.connect()
+    conn.last_used = 0
+
+    assert not conn.is_idle()
+
+
+def test_apns_get_frame_struct_cached():
+    frame_struct = apns.get_frame_struct(32, 10)
+
+    assert apns.get_frame_struct(32, 10) is frame_struct
+    assert apns.get_frame_struct(32, 11) is not frame_struct
+    assert frame_struct.size == 5 + 15 + 32 + 10 + 4 + 4 + 1
+
+
+def test_apns_message_stream_serializes_once():
+    message = apns.APNSMessage("foo")
+
+    with mock.patch.object(message, "to_json", return_value=b"{}") as to_json:
+        stream = apns.APNSMessageStream(apns_tokens(5), message, 0, 10, 2)
+        list(stream)
+        stream.seek(1)
+        list(stream)
+
+        assert to_json.call_count == 1
+
+
+def test_apns_message_stream_peek():
+    tokens = apns_tokens(5)
+    stream = apns.APNSMessageStream(tokens, apns.APNSMessage("foo"), 0, 10)
+    stream.seek(2)
+
+    assert list(stream.peek()) == tokens[2:]
+    assert list(stream.peek(2)) == tokens[2:4]
+    assert list(stream.peek(10)) == tokens[2:]
+
+
+def test_apns_message_stream_debug_logging(caplog):
+    tokens = apns_tokens(2)
+    stream = apns.APNSMessageStream(tokens, apns.APNSMessage("foo"), 0, 10)
+
+    with caplog.at_level(logging.INFO, logger="pushjack.apns"):
+        list(stream)
+
+    assert not caplog.records
+
+    stream.seek(0)
+
+    with caplog.at_level(logging.DEBUG, logger="pushjack.apns"):
+        list(stream)
+
+    messages = [record.getMessage() for record in caplog.records]
+
+    for token in tokens:
+        assert "Preparing notification for APNS token {0}".format(token) in messages
+
+
+@parametrize("batch_size", [1, 2, 3, 10])
+def test_apns_message_stream_batches(batch_size):
+    tokens = apns_tokens(3) + ["ab" * 54, "cd" * 16]
+    message = apns.APNSMessage("foo")
+    stream = apns.APNSMessageStream(tokens, message, 30, 10, batch_size)
+    expected = b"".join(
+        stream.pack(token, i, message.to_json(), 30, 10)
+        for i, token in enumerate(tokens)
+    )
+
+    assert b"".join(stream) == expected
+    assert stream.next_identifier == len(tokens)
+
+
+@parametrize("read_size", [1, 7, 38, 40, 4096])
+def test_apns_get_expired_tokens_chunked(apns_client, read_size):
+    tokens = apns_tokens(10)
+
+    with mock.patch("pushjack.apns.create_socket") as create_socket:
+        with mock.patch("pushjack.apns.APNS_FEEDBACK_READ_SIZE", read_size):
+            create_socket.return_value = apns_feedback_socket_factory(tokens)
+            expired_tokens = apns_client.get_expired_tokens()
+
+    assert [expired_token.token for expired_token in expired_tokens] == tokens
+
+
+@parametrize(
+    "count,connections,batch_size,expected_connections",
+    [
+        (10, 3, 5, 2),
+        (100, 3, 10, 3),
+        (101, 4, 10, 4),
+        (100, 1, 10, 1),
+        (9, 3, 10, 1),
+    ],
+)
+def test_apns_send_parallel(
+    apns_client, apns_socket, count, connections, batch_size, expected_connections
+):
+    tokens = apns_tokens(count)
+    used = {"conns": set(), "tokens": []}
+
+    def sendall(conn, stream, error_timeout, retries):
+        used["conns"].add(id(conn))
+        used["tokens"].extend(stream.tokens)
+        errors = [exceptions.APNSProcessingError(0)]
+        return apns.APNSResponse(stream.tokens, stream.message, errors)
+
+    with mock.patch.object(
+        apns.APNSConnection, "sendall", autospec=True, side_effect=sendall
+    ):
+        res = apns_client.send(
+            tokens, "foo", connections=connections, batch_size=batch_size
+        )
+
+    size = -(-count // expected_connections)
+    expected_failures = tokens[::size]
+
+    assert len(used["conns"]) == expected_connections
+    assert sorted(used["tokens"]) == sorted(tokens)
+    assert res.tokens == tokens
+    assert res.failures == expected_failures
+    assert res.successes == [token for token in tokens if token not in res.failures]
+    assert [error.identifier for error in res.errors] == [
+        tokens.index(token) for token in expected_failures
+    ]
+
+
+def test_apns_send_parallel_error(apns_client, apns_socket):
+    tokens = apns_tokens(20)
+    sent = []
+
+    def sendall(conn, stream, error_timeout, retries):
+        if stream.tokens[0] == tokens[0]:
+            raise socket.error("connection reset")
+
+        sent.extend(stream.tokens)
+        return apns.APNSResponse(stream.tokens, stream.message, [])
+
+    with mock.patch.object(
+        apns.APNSConnection, "sendall", autospec=True, side_effect=sendall
+    ):
+        with pytest.raises(socket.error):
+            apns_client.send(tokens, "foo", connections=2, batch_size=5)
+
+    # The other connection still finishes sending its notifications.
+    assert sent == tokens[10:]
+
+
+def test_apns_send_parallel_reuses_connections(apns_client, apns_socket):
+    apns_client.send(apns_tokens(20), "foo", connections=2, batch_size=5)
+    conns = apns_client.get_connections(2)
+    apns_client.send(apns_tokens(20), "foo", connections=2, batch_size=5)
+
+    assert apns_client.get_connections(2) == conns
+    assert len(set(map(id, conns))) == 2
+
+    apns_client.close()
+
+
+@parametrize(
+    "message,options",
+    [
+        ("Hello world", {}),
+        ("Hello world", {"badge": 1}),
+        ("Hello world", {"badge": 0, "sound": "chime"}),
+        ('Héllo "world"', {"sound": "chime"}),
+        ("", {}),
+        ("Hello world", {"category": ""}),
+        ("Hello world", {"thread_id": "t", "badge": 1}),
+        ("Hello world", {"title": "title"}),
+        ("Hello world", {"extra": {"custom": 1}}),
+        ("Hello world", {"content_available": True, "mutable_content": True}),
+        ("Hello world", {"max_payload_length": 20}),
+        (None, {"badge": 1}),
+        ({"body": "Hello world"}, {}),
+    ],
+)
+def test_apns_message_to_json(message, options):
+    message = apns.APNSMessage(message, **options)
+    assert message.to_json() == json_dumps(message.to_dict())
+
+
+def test_apns_message_to_json_cached():
+    message = apns.APNSMessage("foo", extra={"custom": 1})
+
+    with mock.patch.object(message, "to_dict", return_value={}) as to_dict:
+        assert message.to_json() is message.to_json()
+        assert len(message) == len(message.to_json())
+        assert to_dict.call_count == 1
+
+
+@parametrize("max_payload_length", [20, 31, 32, 33, 50, 100])
+@parametrize("alert", ["Hello world, this is a long message", 'Héllo "wörld" ' * 5])
+def test_apns_message_truncated(alert, max_payload_length):
+    message = apns.APNSMessage(alert, max_payload_length=max_payload_length)
+    payload = message.to_json()
+    body = message.to_dict()["aps"].get("alert")
+
+    assert len(payload) <= max_payload_length
+
+    if body and body != alert:
+        # Keeping one more character of the message would exceed the limit.
+        longer = body[:-3] + alert[len(body) - 3] + "..."
+        assert len(json_dumps({"aps": {"alert": longer}})) > max_payload_length
+
+
+def test_apns_connection_closed_on_unexpected_error(apns_client, apns_socket):
+    apns_client.send(apns_tokens(1), "foo")
+
+    with mock.patch.object(
+        apns.APNSConnection, "write", side_effect=ValueError("boom")
+    ):
+        with pytest.raises(ValueError):
+            apns_client.send(apns_tokens(1), "foo")
+
+    assert apns_socket.close.call_count == 1
+    assert apns_client.conn.sock is None
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+import mock
+import pytest
+
+from pushjack import apns, utils
+
+
+class FakeOrjson(object):
+    """Stand-in for ``orjson`` which, like it, encodes non-ASCII as UTF-8."""
+
+    OPT_SORT_KEYS = 1
+
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = []
+
+    def dumps(self, data, option=None):
+        self.calls.append((data, option))
+
+        if self.error:
+            raise self.error
+
+        return json.dumps(
+            data, separators=(",", ":"), sort_keys=True, ensure_ascii=False
+        ).encode("utf8")
+
+
+@pytest.fixture
+def fake_orjson():
+    orjson = FakeOrjson()
+
+    with mock.patch.object(utils, "orjson", orjson):
+        yield orjson
+
+
+def test_json_dumps_without_orjson():
+    with mock.patch.object(utils, "orjson", None):
+        assert utils.json_dumps({"b": 1, "a": u"é"}) == b'{"a":"\\u00e9","b":1}'
+
+
+def test_json_dumps_with_orjson(fake_orjson):
+    data = {"b": 1, "a": u"é"}
+
+    assert utils.json_dumps(data) == u'{"a":"é","b":1}'.encode("utf8")
+    assert fake_orjson.calls == [(data, FakeOrjson.OPT_SORT_KEYS)]
+
+
+def test_json_dumps_orjson_fallback(fake_orjson):
+    fake_orjson.error = TypeError("Type is not JSON serializable")
+
+    assert utils.json_dumps({"b": 1, "a": u"é"}) == b'{"a":"\\u00e9","b":1}'
+    assert len(fake_orjson.calls) == 1
+
+
+def test_apns_message_truncated_with_orjson(fake_orjson):
+    message = apns.APNSMessage(u"é" * 100, max_payload_length=50)
+    payload = message.to_json()
+
+    assert len(payload) <= 50
+    assert u"é".encode("utf8") in payload
+    assert utils.json_loads(payload)["aps"]["alert"].endswith("...")